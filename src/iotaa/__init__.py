@@ -4,23 +4,23 @@ iotaa.
 
 from __future__ import annotations
 
-import json
 import logging
 import sys
-from argparse import ArgumentParser, HelpFormatter, Namespace
 from collections import defaultdict
 from dataclasses import dataclass
-from functools import wraps
-from hashlib import md5
+from functools import cache, wraps
 from importlib import import_module
-from importlib import resources as res
-from itertools import chain
-from json import JSONDecodeError, loads
 from pathlib import Path
 from subprocess import STDOUT, CalledProcessError, check_output
 from types import ModuleType
 from types import SimpleNamespace as ns
-from typing import Any, Callable, Generator, Iterator, Optional, Union
+from typing import TYPE_CHECKING, Any, Callable, Generator, Iterator, Optional, Union
+
+if TYPE_CHECKING:
+    from argparse import HelpFormatter, Namespace
+
+# Modules needed only by the CLI (argparse, json, importlib.resources) or for Graphviz output
+# (hashlib) are imported where used, so that importing iotaa to define tasks does not pay for them.
 
 # Public return-value classes:
 
@@ -34,6 +34,8 @@ class Asset:
     :param ready: A function that, when called, indicates whether the asset is ready to use.
     """
 
+    __slots__ = ("ref", "ready", "taskname")  # taskname is set on return from a task function.
+
     ref: Any
     ready: Callable[..., bool]
 
@@ -73,18 +75,17 @@ class _Graph:
         """
         Returns the task/asset graph in Graphviz dot format.
         """
-        f = (
-            lambda name, shape, ready=None: '%s [fillcolor=%s, label="%s", shape=%s, style=filled]'
-            % (
-                self.name(name),
-                self.color[ready],
-                name,
-                shape,
-            )
+        name = cache(self.name)  # each node is named once, however many edges it has
+        colors, shapes = self.color, self.shape
+        f = lambda x, shape, ready=None: '%s [fillcolor=%s, label="%s", shape=%s, style=filled]' % (
+            name(x),
+            colors[ready],
+            x,
+            shape,
         )
-        edges = ["%s -> %s" % (self.name(a), self.name(b)) for a, b in self.edges]
-        nodes_a = [f(ref, self.shape.asset, ready()) for ref, ready in self.assets.items()]
-        nodes_t = [f(x, self.shape.task) for x in self.tasks]
+        edges = ["%s -> %s" % (name(a), name(b)) for a, b in self.edges]
+        nodes_a = [f(ref, shapes.asset, ready()) for ref, ready in self.assets.items()]
+        nodes_t = [f(x, shapes.task) for x in self.tasks]
         return "digraph g {\n  %s\n}" % "\n  ".join(sorted(nodes_t + nodes_a + edges))
 
     @property
@@ -101,6 +102,8 @@ class _Graph:
         :param name: An iotaa asset/task name.
         :return: A Graphviz-appropriate node name.
         """
+        from hashlib import md5  # pylint: disable=import-outside-toplevel
+
         return "_%s" % md5(str(name).encode("utf-8")).hexdigest()
 
     @property
@@ -125,29 +128,39 @@ class _Graph:
         :param taskname: The current task's name.
         :param alist: Flattened required-task assets.
         """
-        asset_taskname = lambda a: getattr(a, "taskname", None)
-        self.assets.update({a.ref: a.ready for a in alist})
-        self.edges |= set((asset_taskname(a), a.ref) for a in alist)
-        self.edges |= set((taskname, asset_taskname(a)) for a in alist)
-        self.tasks |= set(asset_taskname(a) for a in alist)
+        for a in alist:
+            req = getattr(a, "taskname", None)
+            self.assets[a.ref] = a.ready
+            self.edges.add((req, a.ref))
+            self.edges.add((taskname, req))
+            self.tasks.add(req)
         self.tasks.add(taskname)
 
-    def update_from_task(self, taskname: str, assets: _AssetT) -> None:
+    def update_from_task(self, taskname: str, alist: list[Asset]) -> None:
         """
         Update graph data structures with current task info.
 
         :param taskname: The current task's name.
-        :param assets: An asset, a collection of assets, or None.
+        :param alist: Flattened current-task assets.
         """
-        alist = _flatten(assets)
-        self.assets.update({a.ref: a.ready for a in alist})
-        self.edges |= set((taskname, a.ref) for a in alist)
+        for a in alist:
+            self.assets[a.ref] = a.ready
+            self.edges.add((taskname, a.ref))
         self.tasks.add(taskname)
 
 
 _graph = _Graph()
 
 
+class _HashableDict(dict):
+    """
+    A dict with a hash value.
+    """
+
+    def __hash__(self):  # type: ignore
+        return hash(frozenset(self.items()))
+
+
 class _Logger:
     """
     Support for swappable loggers.
@@ -281,12 +294,12 @@ def refs(assets: _AssetT) -> Any:
     :return: Asset reference(s) in the same shape (e.g. dict, list, scalar, None) as the asets.
     """
 
+    if isinstance(assets, Asset):
+        return assets.ref
     if isinstance(assets, dict):
         return {k: v.ref for k, v in assets.items()}
     if isinstance(assets, list):
         return [a.ref for a in assets]
-    if isinstance(assets, Asset):
-        return assets.ref
     return None
 
 
@@ -371,15 +384,7 @@ def tasknames(obj: object) -> list[str]:
     :param obj: An object.
     :return: The names of iotaa tasks in the given object.
     """
-
-    def f(o):
-        return (
-            getattr(o, "__iotaa_task__", False)
-            and not hasattr(o, "__isabstractmethod__")
-            and not o.__name__.startswith("_")
-        )
-
-    return sorted(name for name in dir(obj) if f(getattr(obj, name)))
+    return list(_tasks(obj))
 
 
 # Public task-graph decorator functions:
@@ -395,13 +400,19 @@ def external(f: Callable) -> _TaskT:
 
     @wraps(f)
     def g(*args, **kwargs) -> _AssetT:
-        taskname, top, g = _task_initial(f, *args, **kwargs)
-        assets = _next(g, "assets")
-        ready = _ready(assets)
-        if not ready or top:
-            _graph.update_from_task(taskname, assets)
-            _report_readiness(ready=ready, taskname=taskname, is_external=True)
-        return _task_final(top, taskname, assets)
+        top = _i_am_top_task()  # Must precede delegation to other tasks!
+        try:
+            taskname, g = _task_initial(f, *args, **kwargs)
+            assets: _AssetT = _next(g, "assets")
+            alist = _flatten(assets)
+            ready = _ready(alist)
+            if not ready or top:
+                _graph.update_from_task(taskname, alist)
+                _report_readiness(ready=ready, taskname=taskname, is_external=True)
+            return _task_final(taskname, assets, alist)
+        finally:
+            if top:
+                _state.reset()
 
     return _mark_task(g)
 
@@ -416,24 +427,31 @@ def task(f: Callable) -> _TaskT:
 
     @wraps(f)
     def g(*args, **kwargs) -> _AssetT:
-        taskname, top, g = _task_initial(f, *args, **kwargs)
-        assets = _next(g, "assets")
-        ready_initial = _ready(assets)
-        if not ready_initial or top:
-            _graph.update_from_task(taskname, assets)
-            _report_readiness(ready=ready_initial, taskname=taskname, initial=True)
-        if not ready_initial:
-            required_assets = _delegate(g, taskname)
-            if _ready(required_assets):
-                _log.info("%s: Requirement(s) ready", taskname)
-                _execute(g, taskname)
-            else:
-                _log.info("%s: Requirement(s) not ready", taskname)
-                _report_readiness(ready=False, taskname=taskname)
-        ready_final = _ready(assets)
-        if ready_final != ready_initial:
-            _report_readiness(ready=ready_final, taskname=taskname)
-        return _task_final(top, taskname, assets)
+        top = _i_am_top_task()  # Must precede delegation to other tasks!
+        try:
+            taskname, g = _task_initial(f, *args, **kwargs)
+            assets: _AssetT = _next(g, "assets")
+            alist = _flatten(assets)
+            ready_initial = _ready(alist)
+            if not ready_initial or top:
+                _graph.update_from_task(taskname, alist)
+                _report_readiness(ready=ready_initial, taskname=taskname, initial=True)
+            ready_final = ready_initial
+            if not ready_initial:
+                _, required_alist = _delegate(g, taskname)
+                if _ready(required_alist):
+                    _log.info("%s: Requirement(s) ready", taskname)
+                    _execute(g, taskname)
+                else:
+                    _log.info("%s: Requirement(s) not ready", taskname)
+                    _report_readiness(ready=False, taskname=taskname)
+                ready_final = _ready(alist)  # requirements may have readied the assets, too
+            if ready_final != ready_initial:
+                _report_readiness(ready=ready_final, taskname=taskname)
+            return _task_final(taskname, assets, alist)
+        finally:
+            if top:
+                _state.reset()
 
     return _mark_task(g)
 
@@ -448,14 +466,19 @@ def tasks(f: Callable) -> _TaskT:
 
     @wraps(f)
     def g(*args, **kwargs) -> _AssetT:
-        taskname, top, g = _task_initial(f, *args, **kwargs)
-        if top:
-            _report_readiness(ready=False, taskname=taskname, initial=True)
-        required_assets = _delegate(g, taskname)
-        ready = _ready(required_assets)
-        if not ready or top:
-            _report_readiness(ready=ready, taskname=taskname)
-        return _task_final(top, taskname, required_assets)
+        top = _i_am_top_task()  # Must precede delegation to other tasks!
+        try:
+            taskname, g = _task_initial(f, *args, **kwargs)
+            if top:
+                _report_readiness(ready=False, taskname=taskname, initial=True)
+            required_assets, required_alist = _delegate(g, taskname)
+            ready = _ready(required_alist)
+            if not ready or top:
+                _report_readiness(ready=ready, taskname=taskname)
+            return _task_final(taskname, required_assets, required_alist)
+        finally:
+            if top:
+                _state.reset()
 
     return _mark_task(g)
 
@@ -469,29 +492,20 @@ def _cacheable(o: _JSONT) -> _CacheableT:
 
     :param o: Some value.
     """
-
-    class hdict(dict):
-        """
-        A dict with a hash value.
-        """
-
-        def __hash__(self):  # type: ignore
-            return hash(tuple(sorted(self.items())))
-
     if isinstance(o, dict):
-        return hdict({k: _cacheable(v) for k, v in o.items()})
+        return _HashableDict({k: _cacheable(v) for k, v in o.items()})
     if isinstance(o, list):
         return tuple(_cacheable(v) for v in o)
     return o
 
 
-def _delegate(g: Generator, taskname: str) -> _AssetT:
+def _delegate(g: Generator, taskname: str) -> tuple[_AssetT, list[Asset]]:
     """
     Delegate execution to the current task's requirement(s).
 
     :param g: The current task.
     :param taskname: The current task's name.
-    :return: The assets of the required task(s).
+    :return: The assets of the required task(s), and the same assets flattened.
     """
 
     # The next value of the generator is the collection of requirements of the current task. This
@@ -501,8 +515,9 @@ def _delegate(g: Generator, taskname: str) -> _AssetT:
 
     _log.info("%s: Checking requirements", taskname)
     assets: _AssetT = _next(g, "requirements")
-    _graph.update_from_requirements(taskname, _flatten(assets))
-    return assets
+    alist = _flatten(assets)
+    _graph.update_from_requirements(taskname, alist)
+    return assets, alist
 
 
 def _execute(g: Generator, taskname: str) -> None:
@@ -528,12 +543,21 @@ def _flatten(assets: Union[_AssetT, dict[str, _AssetT], list[_AssetT]]) -> list[
 
     :param assets: An asset, a collection of assets, or None.
     """
-    if assets is None:
-        return []
-    if isinstance(assets, Asset):
+    if isinstance(assets, Asset):  # the common single-asset case needs no stack
         return [assets]
-    xs = assets if isinstance(assets, list) else assets.values()
-    return list(filter(None, chain.from_iterable(_flatten(x) for x in xs)))
+    alist: list[Asset] = []
+    stack: list[Any] = [assets]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, Asset):
+            alist.append(x)
+        elif isinstance(x, dict):
+            stack.extend(reversed(x.values()))
+        elif isinstance(x, list):
+            stack.extend(reversed(x))
+        elif x is not None:
+            raise TypeError("Expected an asset, a dict, a list, or None, not %s" % type(x).__name__)
+    return alist
 
 
 def _formatter(prog: str) -> HelpFormatter:
@@ -543,6 +567,8 @@ def _formatter(prog: str) -> HelpFormatter:
     :param prog: The program name.
     :return: An argparse help formatter.
     """
+    from argparse import HelpFormatter  # pylint: disable=import-outside-toplevel
+
     return HelpFormatter(prog, max_help_position=4)
 
 
@@ -589,6 +615,8 @@ def _parse_args(raw: list[str]) -> Namespace:
     :param args: Raw command-line arguments.
     :return: Parsed command-line arguments.
     """
+    from argparse import ArgumentParser  # pylint: disable=import-outside-toplevel
+
     parser = ArgumentParser(add_help=False, formatter_class=_formatter)
     parser.add_argument("module", help="application module name or path", type=str)
     parser.add_argument("function", help="task name", type=str, nargs="?")
@@ -612,14 +640,17 @@ def _parse_args(raw: list[str]) -> Namespace:
     return args
 
 
-def _ready(assets: _AssetT) -> bool:
+def _ready(alist: list[Asset]) -> bool:
     """
-    Readiness of the specified asset(s).
+    Readiness of the specified assets.
 
-    :param assets: An asset, a collection of assets, or None.
+    :param alist: Flattened assets.
     :return: Are all the assets ready?
     """
-    return all(a.ready() for a in _flatten(assets))
+    for a in alist:
+        if not a.ready():
+            return False
+    return True
 
 
 def _reify(s: str) -> _CacheableT:
@@ -629,11 +660,12 @@ def _reify(s: str) -> _CacheableT:
     :param s: The string to convert.
     :return: A more Pythonic representation of the input string.
     """
+    from json import JSONDecodeError, loads  # pylint: disable=import-outside-toplevel
 
     try:
         return _cacheable(loads(s))
     except JSONDecodeError:
-        return _cacheable(loads(f'"{s}"'))
+        return s
 
 
 def _report_readiness(
@@ -666,46 +698,65 @@ def _show_tasks(name: str, obj: ModuleType) -> None:
     :param obj: The task-bearing object itself.
     """
     print("Tasks in %s:" % name)
-    for t in tasknames(obj):
+    for t, f in _tasks(obj).items():
         print("  %s" % t)
-        if doc := getattr(obj, t).__doc__:
+        if doc := f.__doc__:
             print("    %s" % doc.strip().split("\n")[0])
     sys.exit(0)
 
 
-def _task_final(top: bool, taskname: str, assets: _AssetT) -> _AssetT:
+def _task_final(taskname: str, assets: _AssetT, alist: list[Asset]) -> _AssetT:
     """
     Final steps common to all task types.
 
-    :param top: Is this the top task?
     :param taskname: The current task's name.
     :param assets: An asset, a collection of assets, or None.
+    :param alist: The same assets, flattened.
     :return: The same assets that were provided as input.
     """
-    if top:
-        _state.reset()
-    for a in _flatten(assets):
+    for a in alist:
         setattr(a, "taskname", taskname)
     return assets
 
 
-def _task_initial(f: Callable, *args, **kwargs) -> tuple[str, bool, Generator]:
+def _task_initial(f: Callable, *args, **kwargs) -> tuple[str, Generator]:
     """
     Inital steps common to all task types.
 
     :param f: A task function (receives the provided args & kwargs).
-    :return: The task's name, its "top" status, and the generator returned by the task.
+    :return: The task's name and the generator returned by the task.
     """
-    top = _i_am_top_task()  # Must precede delegation to other tasks!
     g = f(*args, **kwargs)
     taskname = _next(g, "task name")
-    return taskname, top, g
+    return taskname, g
+
+
+def _tasks(obj: object) -> dict[str, Callable]:
+    """
+    The iotaa tasks in the given object.
+
+    :param obj: An object.
+    :return: A mapping from task names to task functions, ordered by name (as dir() is).
+    """
+
+    def f(o):
+        return (
+            getattr(o, "__iotaa_task__", False)
+            and not hasattr(o, "__isabstractmethod__")
+            and not o.__name__.startswith("_")
+        )
+
+    return {name: o for name in dir(obj) if f(o := getattr(obj, name))}
 
 
 def _version() -> str:
     """
     Return version information.
     """
+    # pylint: disable=import-outside-toplevel
+    import json
+    from importlib import resources as res
+
     with res.files("iotaa.resources").joinpath("info.json").open("r") as f:
         info = json.load(f)
         return "version %s build %s" % (info["version"], info["buildnum"])
@@ -4,8 +4,8 @@ iotaa.demo.
 
 # pylint: disable=C0116
 
-import datetime as dt
 import logging
+import time
 from pathlib import Path
 
 from iotaa import asset, external, refs, task, tasks
@@ -25,7 +25,7 @@ def spoon(basedir):
     yield "A spoon"
     yield asset(path, path.exists)
     yield None
-    path.parent.mkdir(parents=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
     path.touch()
 
 
@@ -49,23 +49,18 @@ def steeped_tea_with_sugar(basedir):
 def steeped_tea(basedir):
     # Give tea time to steep.
     yield "Steeped tea"
-    water = refs(steeping_tea(basedir))["water"]
-    steep_time = lambda x: asset("elapsed time", lambda: x)
+    the_steeping_tea = steeping_tea(basedir)
+    water = refs(the_steeping_tea)["water"]
     t = 10  # seconds
-    if water.exists():
-        water_poured_time = dt.datetime.fromtimestamp(water.stat().st_mtime)
-        ready_time = water_poured_time + dt.timedelta(seconds=t)
-        now = dt.datetime.now()
-        ready = now >= ready_time
-        remaining = int((ready_time - now).total_seconds())
-        yield steep_time(ready)
-    else:
-        ready = False
+    try:
+        remaining = water.stat().st_mtime + t - time.time()
+    except FileNotFoundError:
         remaining = t
-        yield steep_time(False)
-    yield steeping_tea(basedir)
+    ready = remaining <= 0
+    yield asset("elapsed time", lambda: ready)
+    yield the_steeping_tea
     if not ready:
-        logging.warning("Tea needs to steep for %ss", remaining)
+        logging.warning("Tea needs to steep for %ss", int(remaining))
 
 
 @task
@@ -89,8 +84,9 @@ def box_of_teabags(basedir):
 
 def ingredient(basedir, fn, name, req=None):
     yield f"{name} in cup"
-    path = refs(cup(basedir)) / fn
+    the_cup = cup(basedir)
+    path = refs(the_cup) / fn
     yield {fn: asset(path, path.exists)}
-    yield [cup(basedir)] + ([req(basedir)] if req else [])
+    yield [the_cup] + ([req(basedir)] if req else [])
     logging.info("Adding %s to cup", fn)
     path.touch()
@@ -5,14 +5,19 @@ Tests for module iotaa.
 # pylint: disable=missing-function-docstring
 # pylint: disable=protected-access
 # pylint: disable=redefined-outer-name
+# pylint: disable=too-many-lines
 # pylint: disable=use-implicit-booleaness-not-comparison
 
 import logging
 import re
 import sys
 from abc import abstractmethod
+from argparse import HelpFormatter, Namespace
+from collections import OrderedDict
 from hashlib import md5
+from subprocess import check_output
 from textwrap import dedent
+from typing import Any
 from unittest.mock import ANY
 from unittest.mock import DEFAULT as D
 from unittest.mock import patch
@@ -178,7 +183,7 @@ def args(path, tasks):
     m = path / "a.py"
     m.touch()
     strs = ["foo", "88", "3.14", "true"]
-    return iotaa.Namespace(
+    return Namespace(
         args=strs,
         dry_run=True,
         function="a_function",
@@ -215,6 +220,14 @@ def test_Asset(asset):
     assert asset.ready()
 
 
+def test_Asset_slots():
+    asset = iotaa.asset("foo", lambda: True)
+    assert not hasattr(asset, "__dict__")
+    assert getattr(asset, "taskname", None) is None
+    asset.taskname = "task"  # type: ignore
+    assert asset.taskname == "task"  # type: ignore
+
+
 @mark.parametrize(
     # One without kwargs, one with:
     "result",
@@ -305,7 +318,7 @@ def test_main_mocked_up(tmp_path):
 
 def test_main_mocked_up_tasknames(tmp_path):
     with patch.multiple(
-        iotaa, _parse_args=D, dryrun=D, import_module=D, logcfg=D, tasknames=D
+        iotaa, _parse_args=D, _tasks=D, dryrun=D, import_module=D, logcfg=D
     ) as mocks:
         with patch.object(iotaa._Graph, "__repr__", return_value="") as __repr__:
             parse_args = mocks["_parse_args"]
@@ -328,6 +341,7 @@ def test_refs():
     expected = "bar"
     asset = iotaa.asset(ref="bar", ready=lambda: True)
     assert iotaa.refs(assets={"foo": asset})["foo"] == expected
+    assert iotaa.refs(assets=OrderedDict(foo=asset))["foo"] == expected
     assert iotaa.refs(assets=[asset])[0] == expected
     assert iotaa.refs(assets=asset) == expected
     assert iotaa.refs(assets=None) is None
@@ -446,6 +460,167 @@ def test_task_ready(caplog, request, task, tmp_path, val):
     assert logged(f"task bar {f_bar}: Requirement(s) ready", caplog)
 
 
+def test_task_ready_checked_once():
+    calls = []
+
+    def ready():
+        calls.append(True)
+        return True
+
+    @iotaa.task
+    def t():
+        yield "t"
+        yield iotaa.asset("a", ready)
+        yield None
+
+    t()
+    assert len(calls) == 1
+
+
+@mark.parametrize("dry_run", [False, True])
+def test_task_ready_rechecked_after_requirements(dry_run):
+    calls = []
+
+    def ready():
+        calls.append(True)
+        return False
+
+    @iotaa.task
+    def t():
+        yield "t"
+        yield iotaa.asset("a", ready)
+        yield None
+
+    with patch.object(iotaa, "_state", new=iotaa._State()) as _state:
+        _state.dry_run = dry_run
+        t()
+    assert len(calls) == 2
+
+
+def test_task_tuple_of_requirements_rejected(tmp_path):
+    ran = []
+
+    @iotaa.external
+    def req():
+        yield "req"
+        yield iotaa.asset("req", lambda: False)
+
+    @iotaa.task
+    def t():
+        f = tmp_path / "f"
+        yield "t"
+        yield iotaa.asset(f, f.is_file)
+        yield (req(), req())
+        ran.append(True)
+
+    with raises(TypeError):
+        t()
+    assert not ran
+
+
+def test_task_ready_via_unready_requirement(caplog, tmp_path):
+    iotaa.logging.getLogger().setLevel(iotaa.logging.INFO)
+    f = tmp_path / "f"
+
+    @iotaa.external
+    def req():
+        yield "req"
+        f.touch()  # a side effect that readies t's asset
+        yield iotaa.asset("req", lambda: False)
+
+    @iotaa.task
+    def t():
+        yield "t"
+        yield iotaa.asset(f, f.is_file)
+        yield req()
+
+    assert iotaa.refs(t()) == f
+    assert logged("t: Requirement(s) not ready", caplog)
+    assert logged("t: Final state: Ready", caplog)
+
+
+def test_tasks_same_name_different_args(tmp_path):
+
+    @iotaa.task
+    def mkdir(path):
+        yield "mkdir"  # the name does not identify the task's arguments
+        yield iotaa.asset(path, path.is_dir)
+        yield None
+        path.mkdir()
+
+    @iotaa.tasks
+    def top():
+        yield "top"
+        yield [mkdir(tmp_path / "x"), mkdir(tmp_path / "y")]
+
+    top()
+    assert (tmp_path / "x").is_dir()
+    assert (tmp_path / "y").is_dir()
+
+
+def test_tasks_not_ready_requirement_reevaluated(tmp_path):
+    calls = []
+    f = tmp_path / "f"
+
+    @iotaa.external
+    def ext():
+        yield "ext"
+        calls.append(True)
+        yield iotaa.asset(f, f.is_file)
+
+    @iotaa.task
+    def maker():
+        yield "maker"
+        yield iotaa.asset(f, f.is_file)
+        yield None
+        f.touch()
+
+    @iotaa.task
+    def user():
+        u = tmp_path / "u"
+        yield "user"
+        yield iotaa.asset(u, u.is_file)
+        yield ext()
+        u.touch()
+
+    @iotaa.tasks
+    def top():
+        yield "top"
+        yield [user(), maker(), user()]
+
+    assets = top()
+    assert len(calls) == 2  # ext was evaluated again once maker had run
+    assert all(a.ready() for a in iotaa._flatten(assets))
+
+
+def test_tasks_state_reset_on_failure(tmp_path):
+
+    @iotaa.external
+    def leaf():
+        yield "leaf"
+        yield iotaa.asset("leaf", lambda: True)
+
+    @iotaa.task
+    def broken():
+        f = tmp_path / "broken"
+        yield "broken"
+        yield iotaa.asset(f, f.is_file)
+        yield leaf()
+        raise RuntimeError("broken")
+
+    @iotaa.tasks
+    def top():
+        yield "top"
+        yield [leaf(), broken()]
+
+    with raises(RuntimeError):
+        top()
+    assert not iotaa._state.initialized
+    with patch.object(iotaa._graph, "reset") as reset_graph:
+        leaf()
+        reset_graph.assert_called_once_with()  # leaf is the top task of a new run
+
+
 def test_tasks_structured():
     a = iotaa.asset(ref="a", ready=lambda: True)
 
@@ -531,7 +706,7 @@ def test__delegate_none(caplog):
     def f():
         yield None
 
-    assert not iotaa._delegate(f(), "task")
+    assert iotaa._delegate(f(), "task") == (None, [])
     assert logged("task: Checking requirements", caplog)
 
 
@@ -544,7 +719,7 @@ def test__delegate_scalar(caplog, delegate_assets):
         yield assets
 
     with patch.object(iotaa._graph, "update_from_requirements") as gufr:
-        assert iotaa._delegate(f(), "task") == assets
+        assert iotaa._delegate(f(), "task") == (assets, [a1])
         gufr.assert_called_once_with("task", [a1])
     assert logged("task: Checking requirements", caplog)
 
@@ -558,7 +733,7 @@ def test__delegate_dict_and_list_of_assets(caplog, delegate_assets):
         yield assets
 
     with patch.object(iotaa._graph, "update_from_requirements") as gufr:
-        assert iotaa._delegate(f(), "task") == assets
+        assert iotaa._delegate(f(), "task") == (assets, [a1, a2, a3, a4])
         gufr.assert_called_once_with("task", [a1, a2, a3, a4])
     assert logged("task: Checking requirements", caplog)
 
@@ -572,7 +747,7 @@ def test__delegate_none_and_scalar(caplog, delegate_assets):
         yield assets
 
     with patch.object(iotaa._graph, "update_from_requirements") as gufr:
-        assert iotaa._delegate(f(), "task") == assets
+        assert iotaa._delegate(f(), "task") == (assets, [a1])
         gufr.assert_called_once_with("task", [a1])
     assert logged("task: Checking requirements", caplog)
 
@@ -598,11 +773,18 @@ def test__flatten():
     assert iotaa._flatten([a, a]) == [a, a]
     assert iotaa._flatten({"foo": a, "bar": a}) == [a, a]
     assert iotaa._flatten([None, a, [a, a], {"foo": a, "bar": a}]) == [a, a, a, a, a]
+    b, c, d = [iotaa.asset(ref=x, ready=lambda: True) for x in "bcd"]
+    nested: Any = [b, {"foo": [c, None], "bar": {"baz": [[d]]}}]  # deeper than _AssetT allows
+    assert iotaa._flatten(nested) == [b, c, d]
+    unsupported: list[Any] = [(b, c), [b, "c"]]
+    for bad in unsupported:
+        with raises(TypeError):
+            iotaa._flatten(bad)
 
 
 def test__formatter():
     formatter = iotaa._formatter("foo")
-    assert isinstance(formatter, iotaa.HelpFormatter)
+    assert isinstance(formatter, HelpFormatter)
     assert formatter._prog == "foo"
 
 
@@ -665,13 +847,11 @@ def test__parse_args_missing_task_ok(switch):
 def test__ready():
     af = iotaa.asset(ref=False, ready=lambda: False)
     at = iotaa.asset(ref=True, ready=lambda: True)
-    assert iotaa._ready(None)
+    assert iotaa._ready([])
     assert iotaa._ready([at])
-    assert iotaa._ready(at)
-    assert iotaa._ready({"ready": at})
+    assert iotaa._ready([at, at])
     assert not iotaa._ready([af])
-    assert not iotaa._ready(af)
-    assert not iotaa._ready({"not ready": af})
+    assert not iotaa._ready([at, af])
 
 
 def test__reify():
@@ -680,7 +860,10 @@ def test__reify():
     assert iotaa._reify("[1, 2]") == (1, 2)
     o = iotaa._reify('{"b": 2, "a": 1}')
     assert o == {"a": 1, "b": 2}
-    assert hash(o) == hash((("a", 1), ("b", 2)))
+    assert hash(o) == hash(frozenset({("a", 1), ("b", 2)}))
+    assert hash(o) == hash(iotaa._reify('{"a": 1, "b": 2}'))
+    for s in ['say "hi"', r"a\tb"]:
+        assert iotaa._reify(s) == s
 
 
 @mark.parametrize(
@@ -710,11 +893,17 @@ def test__show_tasks(capsys, task_class):
     assert capsys.readouterr().out.strip() == dedent(expected).strip()
 
 
+def test__tasks(task_class):
+    tasks = iotaa._tasks(task_class())
+    assert list(tasks) == ["bar", "baz", "foo"]
+    assert tasks["foo"].__name__ == "foo"
+
+
 @mark.parametrize("assets", simple_assets())
 def test__task_final(assets):
     for a in iotaa._flatten(assets):
         assert getattr(a, "taskname", None) is None
-    assets = iotaa._task_final(False, "task", assets)
+    assert iotaa._task_final("task", assets, iotaa._flatten(assets)) is assets
     for a in iotaa._flatten(assets):
         assert getattr(a, "taskname") == "task"
 
@@ -726,9 +915,8 @@ def test__task_inital():
 
     with patch.object(iotaa, "_state", iotaa._State()):
         tn = "task"
-        taskname, top, g = iotaa._task_initial(f, tn, n=88)
+        taskname, g = iotaa._task_initial(f, tn, n=88)
         assert taskname == tn
-        assert top is True
         assert next(g) == 88
 
 
@@ -757,6 +945,16 @@ def test__Graph___repr__(capsys):
     assert 1 == len([x for x in out if "fillcolor=%s," % iotaa._graph.color[False] in x])
 
 
+def test__Graph___repr___names_once():
+    with patch.object(iotaa, "_graph", iotaa._Graph()) as graph:
+        graph.assets = {"foo": lambda: True}
+        graph.edges = {("baz", "foo"), ("qux", "baz")}
+        graph.tasks = {"baz", "qux"}
+        with patch.object(iotaa._Graph, "name", side_effect=str) as name:
+            str(graph)
+        assert sorted(c.args[0] for c in name.call_args_list) == ["baz", "foo", "qux"]
+
+
 def test__Graph_color():
     assert isinstance(iotaa._graph.color, dict)
 
@@ -808,7 +1006,7 @@ def test__Graph_update_from_requirements(assets, empty_graph):
 def test__Graph_update_from_task(assets, empty_graph):
     taskname = "task"
     with patch.object(iotaa, "_graph", empty_graph):
-        iotaa._graph.update_from_task(taskname, assets)
+        iotaa._graph.update_from_task(taskname, iotaa._flatten(assets))
         assert all(a() for a in iotaa._graph.assets.values())
         assert iotaa._graph.tasks == {taskname}
         assert iotaa._graph.edges == {(taskname, x.ref) for x in iotaa._flatten(assets)}
@@ -840,6 +1038,24 @@ def test__State_reset():
 # Misc tests
 
 
+def test_lazy_imports():
+    # Modules loaded by iotaa's own eager stdlib imports are excluded, so that the check does not
+    # depend on those modules' internal imports.
+    deps = ["collections", "dataclasses", "functools", "importlib", "logging", "pathlib"]
+    deps += ["subprocess", "types", "typing"]
+    mods = {"argparse", "hashlib", "importlib.resources", "json"}
+    code = "; ".join(
+        [
+            "import sys, %s" % ", ".join(deps),
+            "before = set(sys.modules)",
+            "import iotaa",
+            "print(*sorted(%s & (set(sys.modules) - before)))" % mods,
+        ]
+    )
+    out = check_output([sys.executable, "-c", code], text=True)
+    assert out.strip() == ""
+
+
 def test_state_reset_via_task():
 
     @iotaa.external